@@ -1,18 +1,76 @@
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import logging
 
+try:
+    from pytdigest import TDigest
+except ImportError:  # optional: fall back to exact quantiles
+    TDigest = None
+
 logger = logging.getLogger(__name__)
 
+# Copy-on-write lets DataCleaner hold the caller's frame without an eager copy
+pd.set_option("mode.copy_on_write", True)
+
+# Frames at least this long use t-digest quantile estimates for outliers
+APPROX_QUANTILE_MIN_ROWS = 100_000
+
+
+def is_text_dtype(dtype) -> bool:
+    """True for object columns and pandas string columns (incl. Arrow-backed)."""
+    return pd.api.types.is_object_dtype(dtype) or isinstance(dtype, pd.StringDtype)
+
+
+def approx_quantiles(arr: np.ndarray, qs: List[float], compression: int = 200) -> np.ndarray:
+    """
+    Estimate quantiles of a 1-D numeric array with a t-digest sketch.
+    NaNs are ignored. Falls back to exact quantiles if pytdigest is missing.
+    """
+    arr = arr[~np.isnan(arr)]
+    if arr.size == 0:
+        return np.full(len(qs), np.nan)
+    if TDigest is None:
+        return np.quantile(arr, qs)
+    digest = TDigest.compute(arr, compression=compression)
+    return np.asarray(digest.inverse_cdf(qs), dtype=np.float64)
+
+
+def process_outlier_column(values: pd.Series,
+                           method: str,
+                           bounds: Optional[Tuple[float, float]] = None
+                           ) -> Tuple[Optional[np.ndarray], Optional[pd.Series], int]:
+    """
+    Outlier handling for a single numeric column; safe to run in worker threads.
+    
+    Returns:
+        Tuple of (keep_mask, capped_values, outlier_count). Row-removing
+        methods (iqr, zscore) return a boolean keep mask, cap returns the
+        clipped column; the unused slot is None.
+    """
+    if method == "zscore":
+        z_scores = np.abs((values - values.mean()) / values.std())
+        return (z_scores <= 3).to_numpy(), None, int((z_scores > 3).sum())
+    
+    lower, upper = bounds
+    outliers = int(((values < lower) | (values > upper)).sum())
+    if method == "iqr":
+        return ((values >= lower) & (values <= upper)).to_numpy(), None, outliers
+    return None, values.clip(lower=lower, upper=upper), outliers
+
+
 class DataCleaner:
     """
     Comprehensive data cleaning for analytics datasets.
     """
     
     def __init__(self, df: pd.DataFrame):
-        self.df = df.copy()
-        self.original_df = df.copy()
+        # Shallow copy: a new frame object sharing data until first write
+        self.df = df.copy(deep=False)
+        self._original_shape = df.shape
+        self._original_columns = list(df.columns)
         self.cleaning_report = {
             "original_shape": df.shape,
             "actions_taken": [],
@@ -35,10 +93,12 @@ class DataCleaner:
             "issues": []
         }
         
-        # Missing values
+        # Missing values (one null-count pass over the whole frame)
+        null_counts = self.df.isnull().sum()
+        null_pcts = null_counts / len(self.df) * 100
         for col in self.df.columns:
-            missing_count = self.df[col].isnull().sum()
-            missing_pct = (missing_count / len(self.df)) * 100
+            missing_count = null_counts[col]
+            missing_pct = null_pcts[col]
             report["missing_values"][col] = {
                 "count": int(missing_count),
                 "percentage": round(missing_pct, 2)
@@ -80,33 +140,43 @@ class DataCleaner:
         initial_missing = self.df.isnull().sum().sum()
         
         if strategy == "auto":
-            for col in self.df.columns:
-                missing_pct = (self.df[col].isnull().sum() / len(self.df)) * 100
-                
-                # Drop column if >70% missing
-                if missing_pct > 70:
-                    self.df = self.df.drop(columns=[col])
+            missing_pct = self.df.isnull().mean() * 100
+            
+            # Drop columns with >70% missing
+            cols_to_drop = missing_pct[missing_pct > 70].index.tolist()
+            self.df = self.df.drop(columns=cols_to_drop)
+            
+            # Median for numeric columns, mode for categorical, in one fillna
+            fill_cols = [col for col in self.df.columns if missing_pct[col] > 0]
+            num_cols = self.df[fill_cols].select_dtypes(include="number").columns.tolist()
+            cat_cols = [col for col in fill_cols if col not in num_cols]
+            
+            fill_values = {}
+            if num_cols:
+                fill_values.update(self.df[num_cols].median().to_dict())
+            if cat_cols:
+                modes = self.df[cat_cols].mode()
+                for col in cat_cols:
+                    mode_value = modes[col].iloc[0] if len(modes) else np.nan
+                    fill_values[col] = "Unknown" if pd.isna(mode_value) else mode_value
+            
+            if fill_values:
+                self.df = self.df.fillna(fill_values)
+            
+            # Report in original column order
+            for col in missing_pct.index:
+                if col in cols_to_drop:
                     self.cleaning_report["actions_taken"].append(
-                        f"Dropped column '{col}' ({missing_pct:.1f}% missing)"
+                        f"Dropped column '{col}' ({missing_pct[col]:.1f}% missing)"
+                    )
+                elif col in num_cols:
+                    self.cleaning_report["actions_taken"].append(
+                        f"Filled {col} with median ({fill_values[col]})"
+                    )
+                elif col in cat_cols:
+                    self.cleaning_report["actions_taken"].append(
+                        f"Filled {col} with mode ('{fill_values[col]}')"
                     )
-                    continue
-                
-                # Fill missing values
-                if missing_pct > 0:
-                    if pd.api.types.is_numeric_dtype(self.df[col]):
-                        # Use median for numeric
-                        fill_value = self.df[col].median()
-                        self.df[col].fillna(fill_value, inplace=True)
-                        self.cleaning_report["actions_taken"].append(
-                            f"Filled {col} with median ({fill_value})"
-                        )
-                    else:
-                        # Use mode for categorical
-                        fill_value = self.df[col].mode()[0] if not self.df[col].mode().empty else "Unknown"
-                        self.df[col].fillna(fill_value, inplace=True)
-                        self.cleaning_report["actions_taken"].append(
-                            f"Filled {col} with mode ('{fill_value}')"
-                        )
         
         elif strategy == "drop_rows":
             before = len(self.df)
@@ -118,13 +188,13 @@ class DataCleaner:
             )
         
         elif strategy == "drop_cols":
-            for col in self.df.columns:
-                missing_pct = (self.df[col].isnull().sum() / len(self.df)) * 100
-                if missing_pct > 50:
-                    self.df = self.df.drop(columns=[col])
-                    self.cleaning_report["actions_taken"].append(
-                        f"Dropped column '{col}' ({missing_pct:.1f}% missing)"
-                    )
+            missing_pct = self.df.isnull().mean() * 100
+            cols_to_drop = missing_pct[missing_pct > 50].index.tolist()
+            self.df = self.df.drop(columns=cols_to_drop)
+            for col in cols_to_drop:
+                self.cleaning_report["actions_taken"].append(
+                    f"Dropped column '{col}' ({missing_pct[col]:.1f}% missing)"
+                )
         
         final_missing = self.df.isnull().sum().sum()
         self.cleaning_report["missing_handled"] = int(initial_missing - final_missing)
@@ -145,6 +215,27 @@ class DataCleaner:
         
         return self.df
     
+    def _column_quantiles(self, columns: List[str], qs: List[float]) -> pd.DataFrame:
+        """
+        Quantiles of numeric columns as a DataFrame indexed by quantile.
+        Exact for small frames; t-digest estimates for float columns of large
+        frames, computed column-parallel.
+        """
+        if len(self.df) < APPROX_QUANTILE_MIN_ROWS:
+            return self.df[columns].quantile(qs)
+        
+        def column_quantiles(col):
+            arr = self.df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            # Sketch interpolation would invent values between integers
+            if not pd.api.types.is_float_dtype(self.df[col]):
+                return np.nanquantile(arr, qs)
+            return approx_quantiles(arr, qs)
+        
+        with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1)) as pool:
+            results = list(pool.map(column_quantiles, columns))
+        
+        return pd.DataFrame(np.column_stack(results), index=qs, columns=columns)
+    
     def handle_outliers(self, columns: List[str] = None, method: str = "iqr") -> pd.DataFrame:
         """
         Handle outliers in numeric columns.
@@ -157,99 +248,157 @@ class DataCleaner:
         if columns is None:
             columns = self.df.select_dtypes(include=[np.number]).columns.tolist()
         
+        columns = [col for col in columns if col in self.df.columns]
         initial_rows = len(self.df)
         
-        for col in columns:
-            if col not in self.df.columns:
-                continue
-                
+        if columns and method in ("iqr", "zscore", "cap"):
+            # Bounds for every column in one quantile pass
+            bounds = {col: None for col in columns}
             if method == "iqr":
-                Q1 = self.df[col].quantile(0.25)
-                Q3 = self.df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower = Q1 - 1.5 * IQR
-                upper = Q3 + 1.5 * IQR
-                
-                outliers_before = ((self.df[col] < lower) | (self.df[col] > upper)).sum()
-                self.df = self.df[(self.df[col] >= lower) & (self.df[col] <= upper)]
-                
-                if outliers_before > 0:
-                    self.cleaning_report["actions_taken"].append(
-                        f"Removed {outliers_before} outliers from '{col}' (IQR method)"
-                    )
+                quartiles = self._column_quantiles(columns, [0.25, 0.75])
+                for col in columns:
+                    Q1 = quartiles.at[0.25, col]
+                    Q3 = quartiles.at[0.75, col]
+                    IQR = Q3 - Q1
+                    bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+            elif method == "cap":
+                percentiles = self._column_quantiles(columns, [0.01, 0.99])
+                for col in columns:
+                    bounds[col] = (percentiles.at[0.01, col], percentiles.at[0.99, col])
             
-            elif method == "zscore":
-                z_scores = np.abs((self.df[col] - self.df[col].mean()) / self.df[col].std())
-                outliers_before = (z_scores > 3).sum()
-                self.df = self.df[z_scores <= 3]
-                
-                if outliers_before > 0:
-                    self.cleaning_report["actions_taken"].append(
-                        f"Removed {outliers_before} outliers from '{col}' (Z-score method)"
-                    )
+            # Per-column masks/clips in parallel (numpy releases the GIL)
+            with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1, len(columns))) as pool:
+                results = list(pool.map(
+                    lambda col: process_outlier_column(self.df[col], method, bounds[col]),
+                    columns
+                ))
             
-            elif method == "cap":
-                p99 = self.df[col].quantile(0.99)
-                p1 = self.df[col].quantile(0.01)
-                capped = ((self.df[col] > p99) | (self.df[col] < p1)).sum()
-                self.df[col] = self.df[col].clip(lower=p1, upper=p99)
+            keep_masks = []
+            for col, (keep_mask, capped, count) in zip(columns, results):
+                if keep_mask is not None:
+                    keep_masks.append(keep_mask)
+                if capped is not None:
+                    self.df[col] = capped
                 
-                if capped > 0:
-                    self.cleaning_report["actions_taken"].append(
-                        f"Capped {capped} values in '{col}' to 1st-99th percentile"
-                    )
+                if count > 0:
+                    if method == "iqr":
+                        message = f"Removed {count} outliers from '{col}' (IQR method)"
+                    elif method == "zscore":
+                        message = f"Removed {count} outliers from '{col}' (Z-score method)"
+                    else:
+                        message = f"Capped {count} values in '{col}' to 1st-99th percentile"
+                    self.cleaning_report["actions_taken"].append(message)
+            
+            # One row filter for all columns
+            if keep_masks:
+                self.df = self.df[np.logical_and.reduce(keep_masks)]
         
         rows_removed = initial_rows - len(self.df)
         self.cleaning_report["rows_removed"] += rows_removed
         
         return self.df
     
-    def convert_data_types(self) -> pd.DataFrame:
-        """Auto-detect and convert appropriate data types."""
+    def convert_data_types(self, sample_size: int = 1000) -> pd.DataFrame:
+        """
+        Auto-detect and convert appropriate data types.
+        
+        Each text column is probed on a sample of up to `sample_size`
+        non-null values; the full column is only parsed when the sample
+        suggests the conversion will succeed. Numeric detection runs first,
+        so numeric-looking columns never go through date parsing.
+        """
         for col in self.df.columns:
-            # Try to convert to datetime
-            if self.df[col].dtype == 'object':
-                try:
-                    # Check if it looks like a date
-                    sample = self.df[col].dropna().iloc[0] if len(self.df[col].dropna()) > 0 else ""
-                    if any(char in str(sample) for char in ['/', '-', ':']):
-                        # Try to convert - use try/except instead of errors='ignore'
-                        try:
-                            converted = pd.to_datetime(self.df[col])
-                            self.df[col] = converted
-                            self.cleaning_report["actions_taken"].append(
-                                f"Converted '{col}' to datetime"
-                            )
-                        except (ValueError, TypeError):
-                            # If conversion fails, leave as is
-                            pass
-                except:
-                    pass
+            if not is_text_dtype(self.df[col].dtype):
+                continue
+            
+            non_null = self.df[col].dropna()
+            if non_null.empty:
+                continue
+            sample = non_null.sample(min(sample_size, len(non_null)), random_state=0)
             
             # Try to convert to numeric
-            if self.df[col].dtype == 'object':
-                try:
-                    numeric_col = pd.to_numeric(self.df[col], errors='coerce')
+            try:
+                if pd.to_numeric(sample, errors='coerce').notna().mean() > 0.5:
+                    # via object so string columns yield plain numpy dtypes
+                    numeric_col = pd.to_numeric(self.df[col].astype(object), errors='coerce')
                     # If >50% successfully converted, keep it
                     if numeric_col.notna().sum() / len(self.df) > 0.5:
                         self.df[col] = numeric_col
                         self.cleaning_report["actions_taken"].append(
                             f"Converted '{col}' to numeric"
                         )
-                except:
-                    pass
+                        continue
+            except (ValueError, TypeError):
+                pass
+            
+            # Try to convert to datetime, only if the sample looks like dates
+            try:
+                sample_str = sample.astype(str)
+                if not sample_str.str.contains(r'[/\-:]').any():
+                    continue
+                parsed = pd.to_datetime(sample_str, format='mixed', errors='coerce')
+                if parsed.notna().mean() > 0.9:
+                    self.df[col] = pd.to_datetime(self.df[col], format='mixed', cache=True)
+                    self.cleaning_report["actions_taken"].append(
+                        f"Converted '{col}' to datetime"
+                    )
+            except (ValueError, TypeError):
+                # If conversion fails, leave as is
+                pass
+        
+        return self.df
+    
+    def optimize_dtypes(self, category_threshold: float = 0.5) -> pd.DataFrame:
+        """
+        Shrink column dtypes to cut memory for later passes.
+        
+        - Integers are downcast to the smallest integer type that fits
+        - Floats are downcast to float32 only when no value changes
+        - Text columns with unique/total ratio below `category_threshold`
+          become categoricals
+        """
+        downcast_cols = []
+        
+        for col in self.df.select_dtypes(include='integer').columns:
+            downcast = pd.to_numeric(self.df[col], downcast='integer')
+            if downcast.dtype != self.df[col].dtype:
+                self.df[col] = downcast
+                downcast_cols.append(col)
+        
+        for col in self.df.select_dtypes(include='float').columns:
+            downcast = pd.to_numeric(self.df[col], downcast='float')
+            # float32 rounds most decimals, so only keep exact downcasts
+            if downcast.dtype != self.df[col].dtype and np.array_equal(
+                downcast.to_numpy(dtype=np.float64), self.df[col].to_numpy(), equal_nan=True
+            ):
+                self.df[col] = downcast
+                downcast_cols.append(col)
+        
+        if downcast_cols:
+            self.cleaning_report["actions_taken"].append(
+                f"Downcast {len(downcast_cols)} numeric columns to smaller dtypes"
+            )
+        
+        if len(self.df) > 0:
+            text_cols = [col for col in self.df.columns if is_text_dtype(self.df[col].dtype)]
+            for col in text_cols:
+                if self.df[col].nunique() / len(self.df) < category_threshold:
+                    self.df[col] = self.df[col].astype('category')
+                    self.cleaning_report["actions_taken"].append(
+                        f"Converted '{col}' to category"
+                    )
         
         return self.df
     
     def standardize_column_names(self) -> pd.DataFrame:
         """Standardize column names (lowercase, no spaces)."""
-        old_names = self.df.columns.tolist()
-        new_names = [
-            col.lower().strip().replace(' ', '_').replace('-', '_')
-            for col in self.df.columns
-        ]
+        old_names = self.df.columns
+        new_names = (
+            old_names.astype(str).str.lower().str.strip()
+            .str.replace(r'[ \-]', '_', regex=True)
+        )
         
-        if old_names != new_names:
+        if not new_names.equals(old_names):
             self.df.columns = new_names
             self.cleaning_report["actions_taken"].append(
                 "Standardized column names (lowercase, underscores)"
@@ -262,10 +411,14 @@ class DataCleaner:
                    remove_duplicates: bool = True,
                    handle_outliers: bool = False,
                    convert_types: bool = True,
-                   standardize_names: bool = True) -> Tuple[pd.DataFrame, Dict]:
+                   standardize_names: bool = True,
+                   engine: str = "pandas") -> Tuple[pd.DataFrame, Dict]:
         """
         Perform automatic comprehensive data cleaning.
         
+        engine="polars" runs duplicate removal, missing-value handling and
+        outlier capping on a Polars frame (requires polars and pyarrow).
+        
         Returns:
             Tuple of (cleaned_dataframe, cleaning_report)
         """
@@ -275,37 +428,147 @@ class DataCleaner:
         if standardize_names:
             self.standardize_column_names()
         
-        # Convert data types
+        # Convert data types, then shrink them
         if convert_types:
             self.convert_data_types()
-        
-        # Remove duplicates
-        if remove_duplicates:
-            self.remove_duplicates()
-        
-        # Handle missing values
-        if handle_missing:
-            self.clean_missing_values(strategy="auto")
-        
-        # Handle outliers (optional, can be aggressive)
-        if handle_outliers:
-            numeric_cols = self.df.select_dtypes(include=[np.number]).columns.tolist()
-            if numeric_cols:
-                self.handle_outliers(columns=numeric_cols, method="cap")
+            self.optimize_dtypes()
+        
+        if engine == "polars":
+            self._clean_with_polars(handle_missing, remove_duplicates, handle_outliers)
+        elif engine == "pandas":
+            # Remove duplicates
+            if remove_duplicates:
+                self.remove_duplicates()
+            
+            # Handle missing values
+            if handle_missing:
+                self.clean_missing_values(strategy="auto")
+            
+            # Handle outliers (optional, can be aggressive)
+            if handle_outliers:
+                numeric_cols = self.df.select_dtypes(include=[np.number]).columns.tolist()
+                if numeric_cols:
+                    self.handle_outliers(columns=numeric_cols, method="cap")
+        else:
+            raise ValueError(f"Unsupported cleaning engine: {engine}")
         
         # Update final report
         self.cleaning_report["final_shape"] = self.df.shape
         self.cleaning_report["total_rows_removed"] = (
-            self.original_df.shape[0] - self.df.shape[0]
+            self._original_shape[0] - self.df.shape[0]
         )
         self.cleaning_report["total_columns_removed"] = (
-            self.original_df.shape[1] - self.df.shape[1]
+            self._original_shape[1] - self.df.shape[1]
         )
         
         logger.info(f"Cleaning complete: {len(self.cleaning_report['actions_taken'])} actions taken")
         
         return self.df, self.cleaning_report
     
+    def _clean_with_polars(self,
+                           handle_missing: bool,
+                           remove_duplicates: bool,
+                           handle_outliers: bool) -> pd.DataFrame:
+        """
+        Polars implementation of the duplicate, missing-value and outlier
+        steps of auto_clean. Produces the same report entries as the pandas
+        methods; the pandas index is carried through as a column.
+        """
+        import polars as pl
+        
+        index_col = "__index__"
+        index_name = self.df.index.name
+        frame = pl.from_pandas(self.df.reset_index(names=index_col))
+        data_cols = [c for c in frame.columns if c != index_col]
+        
+        # Remove duplicates
+        if remove_duplicates:
+            before = frame.height
+            frame = frame.unique(subset=data_cols, keep="first", maintain_order=True)
+            removed = before - frame.height
+            if removed > 0:
+                self.cleaning_report["rows_removed"] += removed
+                self.cleaning_report["actions_taken"].append(
+                    f"Removed {removed} duplicate rows"
+                )
+        
+        # Handle missing values (same rules as clean_missing_values "auto")
+        if handle_missing and frame.height > 0:
+            n = frame.height
+            null_counts = frame.select(pl.col(data_cols).null_count()).row(0, named=True)
+            initial_missing = sum(null_counts.values())
+            
+            drop_cols = [c for c in data_cols if null_counts[c] / n * 100 > 70]
+            for col in drop_cols:
+                self.cleaning_report["actions_taken"].append(
+                    f"Dropped column '{col}' ({null_counts[col] / n * 100:.1f}% missing)"
+                )
+            frame = frame.drop(drop_cols)
+            data_cols = [c for c in data_cols if c not in drop_cols]
+            
+            fill_cols = [c for c in data_cols if null_counts[c] > 0]
+            num_cols = [c for c in fill_cols if frame.schema[c].is_numeric()]
+            cat_cols = [c for c in fill_cols if c not in num_cols]
+            
+            fill_values = {}
+            if num_cols:
+                fill_values.update(frame.select(pl.col(num_cols).median()).row(0, named=True))
+            if cat_cols:
+                modes = frame.select(
+                    [pl.col(c).drop_nulls().mode().sort().first() for c in cat_cols]
+                ).row(0, named=True)
+                fill_values.update({c: "Unknown" if v is None else v for c, v in modes.items()})
+            
+            frame = frame.with_columns(
+                [pl.col(c).fill_null(fill_values[c]) for c in fill_cols]
+            )
+            for col in fill_cols:
+                if col in num_cols:
+                    self.cleaning_report["actions_taken"].append(
+                        f"Filled {col} with median ({fill_values[col]})"
+                    )
+                else:
+                    self.cleaning_report["actions_taken"].append(
+                        f"Filled {col} with mode ('{fill_values[col]}')"
+                    )
+            
+            final_missing = sum(frame.select(pl.col(data_cols).null_count()).row(0))
+            self.cleaning_report["missing_handled"] = int(initial_missing - final_missing)
+        
+        # Cap outliers at the 1st-99th percentile
+        if handle_outliers:
+            num_cols = [c for c in data_cols if frame.schema[c].is_numeric()]
+            if num_cols:
+                bounds = frame.select(
+                    [pl.col(c).quantile(0.01, interpolation="linear").alias(f"{c}_p1") for c in num_cols]
+                    + [pl.col(c).quantile(0.99, interpolation="linear").alias(f"{c}_p99") for c in num_cols]
+                ).row(0, named=True)
+                capped = frame.select(
+                    [((pl.col(c) < bounds[f"{c}_p1"]) | (pl.col(c) > bounds[f"{c}_p99"])).sum().alias(c)
+                     for c in num_cols]
+                ).row(0, named=True)
+                # Like pandas' clip, integer columns become float64 unless both bounds are whole numbers
+                def capped_col(c):
+                    lower, upper = bounds[f"{c}_p1"], bounds[f"{c}_p99"]
+                    col = pl.col(c)
+                    if frame.schema[c].is_integer() and not all(
+                        b is None or float(b).is_integer() for b in (lower, upper)
+                    ):
+                        col = col.cast(pl.Float64)
+                    return col.clip(lower, upper)
+                
+                frame = frame.with_columns([capped_col(c) for c in num_cols])
+                for col in num_cols:
+                    if capped[col] > 0:
+                        self.cleaning_report["actions_taken"].append(
+                            f"Capped {capped[col]} values in '{col}' to 1st-99th percentile"
+                        )
+        
+        self.df = frame.to_pandas().set_index(index_col)
+        self.df.index.name = index_name
+        
+        return self.df
+    
     def get_cleaning_summary(self) -> str:
         """Get a human-readable summary of cleaning actions."""
         summary = []
@@ -1,25 +1,79 @@
 import os
 import logging
 import gc
-from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from backend.vectorstore import get_embeddings, clear_vectorstore
-from backend.utils import df_to_passages
+import queue
+import threading
+import numpy as np
+from backend.vectorstore import (
+    get_embeddings, init_chroma, clear_vectorstore, add_documents_batched,
+    CHROMA_ADD_BATCH_SIZE
+)
+from backend.utils import iter_passage_tables, PASSAGE_METADATA_COLUMNS
 
 logger = logging.getLogger(__name__)
 
-def ingest_dataframe(df, persist_dir=None, clear_existing=True):
+# Passages embedded and inserted per batch
+INGEST_BATCH_PASSAGES = 256
+# Passage batches built ahead of the embedder
+INGEST_QUEUE_SIZE = 4
+
+_DONE = object()
+
+def _put_until_stopped(batches, item, stop):
+    """Put `item` on the bounded queue; returns False if `stop` is set first."""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _drain(batches):
+    """Discard whatever is left in the queue."""
+    while True:
+        try:
+            batches.get_nowait()
+        except queue.Empty:
+            return
+
+def _produce_passage_batches(df, batches, stop):
+    """
+    Build passage tables into the bounded `batches` queue until done or
+    `stop` is set. Errors are forwarded to the consumer through the queue.
+    """
+    try:
+        items = iter_passage_tables(df, passages_per_batch=INGEST_BATCH_PASSAGES)
+        for item in items:
+            if not _put_until_stopped(batches, item, stop):
+                return
+    except Exception as e:
+        _put_until_stopped(batches, e, stop)
+        return
+    _put_until_stopped(batches, _DONE, stop)
+
+def ingest_dataframe(df, persist_dir=None, clear_existing=True, on_progress=None):
     """
     Convert DataFrame to documents and store in Chroma vector database.
     
+    Passages are built by a producer thread and handed over in batches
+    through a bounded queue, so passage construction overlaps with
+    embedding and only a few batches are held in memory at once.
+    Embedded batches are buffered and written to Chroma in chunks of
+    CHROMA_ADD_BATCH_SIZE rows, or the client's max_batch_size if smaller.
+    
     Args:
         df: pandas DataFrame to ingest
         persist_dir: Directory to persist the vector store
         clear_existing: Whether to clear existing data before ingesting
+        on_progress: Optional callback, called with the number of rows
+            embedded so far after each batch
     
     Returns:
         Dictionary with ingestion statistics
     """
+    stop = threading.Event()
+    producer = None
     try:
         # Force garbage collection before we start
         gc.collect()
@@ -32,39 +86,65 @@ def ingest_dataframe(df, persist_dir=None, clear_existing=True):
         if clear_existing:
             persist = clear_vectorstore(persist)
         
-        # Convert DataFrame to passages
-        passages = df_to_passages(df)
+        vectordb = init_chroma(persist_directory=persist, embedding_fn=embedding_fn)
+        # Chroma rejects inserts larger than the client's max_batch_size
+        flush_size = min(CHROMA_ADD_BATCH_SIZE, vectordb._client.max_batch_size)
         
-        # Create documents
-        docs = [
-            Document(
-                page_content=p["text"],
-                metadata=p["metadata"]
-            ) for p in passages
-        ]
+        batches = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        producer = threading.Thread(
+            target=_produce_passage_batches, args=(df, batches, stop), daemon=True
+        )
+        producer.start()
         
-        logger.info(f"Created {len(docs)} documents from DataFrame")
+        documents_ingested = 0
+        texts, embeddings, metadatas = [], [], []
+        while True:
+            passages = batches.get()
+            if passages is _DONE:
+                break
+            if isinstance(passages, Exception):
+                raise passages
+            
+            batch_texts = passages.column("text").to_pylist()
+            texts.extend(batch_texts)
+            # Buffer vectors as float32 arrays rather than lists of Python floats
+            embeddings.append(np.asarray(embedding_fn.embed_documents(batch_texts), dtype=np.float32))
+            metadatas.extend(passages.select(PASSAGE_METADATA_COLUMNS).to_pylist())
+            
+            if on_progress is not None:
+                on_progress(passages.column("end_row")[-1].as_py() + 1)
+            
+            if len(texts) >= flush_size:
+                # Write whole chunks now, carry the remainder to the next one
+                n = len(texts) - len(texts) % flush_size
+                vectors = np.vstack(embeddings)
+                documents_ingested += add_documents_batched(vectordb, texts[:n], vectors[:n], metadatas[:n])
+                texts, embeddings, metadatas = texts[n:], [vectors[n:]], metadatas[n:]
         
-        # Create vector store from documents
-        vectordb = Chroma.from_documents(
-            documents=docs,
-            embedding=embedding_fn,
-            persist_directory=persist
-        )
+        if texts:
+            documents_ingested += add_documents_batched(vectordb, texts, np.vstack(embeddings), metadatas)
+        
+        producer.join()
         
         # Force cleanup
-        del vectordb
+        del vectordb, texts, embeddings, metadatas
         gc.collect()
         
-        logger.info(f"Successfully ingested {len(docs)} documents")
+        logger.info(f"Successfully ingested {documents_ingested} documents")
         
         return {
             "success": True,
-            "documents_ingested": len(docs),
+            "documents_ingested": documents_ingested,
             "rows_processed": len(df)
         }
         
     except Exception as e:
+        stop.set()
+        if producer is not None:
+            # Unblock the producer so it exits, then release the batches it built
+            _drain(batches)
+            producer.join()
+            _drain(batches)
         logger.error(f"Error during ingestion: {str(e)}")
         return {
             "success": False,
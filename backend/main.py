@@ -1,10 +1,18 @@
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import asyncio
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from backend.ingest import ingest_dataframe
-from backend.utils import read_uploaded_file_bytes, get_dataframe_summary
-from backend.qa import run_query, generate_insights
+from backend.utils import read_uploaded_file_bytes, get_dataframe_summary, dataframe_to_arrow_ipc
+from backend.qa import run_query, stream_query, generate_insights, stream_insights
+from backend.vectorstore import get_embeddings
 from backend.cleaning import clean_dataframe, DataCleaner  # NEW
 from dotenv import load_dotenv
 import logging
@@ -18,7 +26,8 @@ load_dotenv()
 app = FastAPI(
     title="Data-to-Insights RAG Agent",
     description="Enterprise Analytics Assistant with RAG powered by Groq",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -30,6 +39,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Background ingestion jobs, keyed by job_id, oldest first
+INGEST_JOBS = {}
+# Finished jobs beyond this many are dropped, oldest first
+MAX_INGEST_JOBS = 32
+# Ingests all clear the shared vector store, so they run one at a time
+INGEST_LOCK = threading.Lock()
+
+# Most recent cleaned DataFrames, keyed by dataset_id
+INGESTED_DATASETS = OrderedDict()
+MAX_INGESTED_DATASETS = 4
+# dataset_id whose passages are currently in the vector store
+STORE_DATASET_ID = None
+
 class QueryRequest(BaseModel):
     question: str
     k: int = 4
@@ -45,6 +67,15 @@ class CleaningRequest(BaseModel):
     convert_types: bool = True
     standardize_names: bool = True
 
+@app.on_event("startup")
+def warm_up_embeddings():
+    """Load the embedding model and run one encode so the first request is warm."""
+    try:
+        get_embeddings().embed_query("warmup")
+        logger.info("Embedding model warmed up")
+    except Exception as e:
+        logger.warning(f"Embedding warm-up failed: {str(e)}")
+
 @app.get("/")
 def root():
     return {
@@ -66,20 +97,106 @@ def root():
 def health():
     return {"status": "healthy"}
 
+def prepare_dataframe(contents: bytes, filename: str, auto_clean: bool):
+    """
+    Parse, optionally clean, and summarize an uploaded file.
+    
+    Returns:
+        Tuple of (df, summary, cleaning_report, cleaning_summary)
+    """
+    df = read_uploaded_file_bytes(contents, filename)
+    
+    logger.info(f"File parsed successfully. Original shape: {df.shape}")
+    
+    # NEW: Data Cleaning
+    cleaning_report = None
+    cleaning_summary = None
+    if auto_clean:
+        logger.info("Starting automatic data cleaning...")
+        cleaner = DataCleaner(df)
+        df, cleaning_report = cleaner.auto_clean(
+            handle_missing=True,
+            remove_duplicates=True,
+            handle_outliers=False,  # Conservative by default
+            convert_types=True,
+            standardize_names=True
+        )
+        cleaning_summary = cleaner.get_cleaning_summary()
+        logger.info(f"Cleaning complete. New shape: {df.shape}")
+        logger.info(f"Cleaning summary:\n{cleaning_summary}")
+    
+    # Get summary of cleaned data
+    summary = get_dataframe_summary(df)
+    
+    return df, summary, cleaning_report, cleaning_summary
+
+def ingest_dataset(dataset_id: str, df, on_progress=None):
+    """
+    Replace the vector store's contents with `df`, unless the store already
+    holds this dataset_id (the same upload bytes and cleaning flag).
+    """
+    global STORE_DATASET_ID
+    with INGEST_LOCK:
+        if dataset_id == STORE_DATASET_ID:
+            logger.info(f"Dataset {dataset_id} is already in the vector store, skipping ingestion")
+            return {"success": True, "documents_ingested": 0, "rows_processed": len(df), "reused_existing": True}
+        
+        # The store is wiped first, so it holds no complete dataset until this succeeds
+        STORE_DATASET_ID = None
+        result = ingest_dataframe(df, clear_existing=True, on_progress=on_progress)
+        if result.get("success"):
+            STORE_DATASET_ID = dataset_id
+        return result
+
+def prune_ingest_jobs():
+    """Drop the oldest finished jobs once more than MAX_INGEST_JOBS are tracked."""
+    finished = [job_id for job_id, job in INGEST_JOBS.items() if job["status"] in ("completed", "failed")]
+    for job_id in finished[:max(len(INGEST_JOBS) - MAX_INGEST_JOBS, 0)]:
+        del INGEST_JOBS[job_id]
+
+def run_ingest_job(job_id: str, dataset_id: str, df):
+    """Embed and store a cleaned DataFrame, recording progress in INGEST_JOBS."""
+    job = INGEST_JOBS[job_id]
+    job["status"] = "running"
+    total_rows = max(len(df), 1)
+    
+    def on_progress(rows_done):
+        job["progress"] = round(rows_done / total_rows, 4)
+    
+    result = ingest_dataset(dataset_id, df, on_progress=on_progress)
+    
+    if result.get("success"):
+        job.update(status="completed", progress=1.0, ingest_result=result)
+        logger.info(f"Ingestion job {job_id} completed: {result}")
+    else:
+        job.update(status="failed", error=result.get("error", "Ingestion failed"))
+        logger.error(f"Ingestion job {job_id} failed: {job['error']}")
+
 @app.post("/ingest")
-async def ingest(file: UploadFile = File(...), auto_clean: bool = True):
+async def ingest(background_tasks: BackgroundTasks,
+                 file: UploadFile = File(...),
+                 auto_clean: bool = True,
+                 background: bool = True):
     """
     Ingest a CSV or Excel file into the vector database.
     Now includes automatic data cleaning!
     
+    Parsing and cleaning happen before the response is sent. With
+    background=True (default) embedding and vector storage run as a
+    background job; poll /ingest/status/{job_id} for completion.
+    
     Args:
         file: The uploaded file
         auto_clean: Whether to automatically clean the data (default: True)
+        background: Whether to ingest in the background (default: True)
     
     Returns:
         - success: bool
         - filename: str
-        - ingest_result: dict with documents_ingested and rows_processed
+        - dataset_id: str - fetch the cleaned data from /ingest/arrow/{dataset_id}
+        - job_id: str (if background=True)
+        - ingest_result: dict with documents_ingested and rows_processed (if background=False);
+          reused_existing is set when the same upload was already ingested
         - data_summary: dict with shape, columns, dtypes, missing values, statistics
         - cleaning_report: dict with cleaning actions taken (if auto_clean=True)
     """
@@ -88,47 +205,49 @@ async def ingest(file: UploadFile = File(...), auto_clean: bool = True):
         
         # Read file
         contents = await file.read()
-        df = read_uploaded_file_bytes(contents, file.filename)
-        
-        logger.info(f"File parsed successfully. Original shape: {df.shape}")
-        
-        # NEW: Data Cleaning
-        cleaning_report = None
-        if auto_clean:
-            logger.info("Starting automatic data cleaning...")
-            cleaner = DataCleaner(df)
-            df, cleaning_report = cleaner.auto_clean(
-                handle_missing=True,
-                remove_duplicates=True,
-                handle_outliers=False,  # Conservative by default
-                convert_types=True,
-                standardize_names=True
-            )
-            logger.info(f"Cleaning complete. New shape: {df.shape}")
-            logger.info(f"Cleaning summary:\n{cleaner.get_cleaning_summary()}")
         
-        # Get summary of cleaned data
-        summary = get_dataframe_summary(df)
+        # Parse and clean off the event loop
+        df, summary, cleaning_report, cleaning_summary = await asyncio.to_thread(
+            prepare_dataframe, contents, file.filename, auto_clean
+        )
         
-        # Ingest into vector DB
-        result = ingest_dataframe(df, clear_existing=True)
-        
-        if not result.get("success"):
-            raise HTTPException(status_code=500, detail=result.get("error", "Ingestion failed"))
-        
-        logger.info(f"Ingestion completed: {result}")
+        # Content hash of the upload, so the same file keeps the same id (and frontend caches)
+        digest = hashlib.blake2b(contents, digest_size=8)
+        digest.update(b"\x01" if auto_clean else b"\x00")
+        dataset_id = digest.hexdigest()
+        INGESTED_DATASETS[dataset_id] = df
+        INGESTED_DATASETS.move_to_end(dataset_id)
+        while len(INGESTED_DATASETS) > MAX_INGESTED_DATASETS:
+            INGESTED_DATASETS.popitem(last=False)
         
         response = {
             "success": True,
             "filename": file.filename,
-            "ingest_result": result,
+            "dataset_id": dataset_id,
             "data_summary": summary
         }
         
+        if background:
+            job_id = uuid.uuid4().hex
+            INGEST_JOBS[job_id] = {"job_id": job_id, "status": "pending", "rows": len(df), "progress": 0.0}
+            prune_ingest_jobs()
+            background_tasks.add_task(run_ingest_job, job_id, dataset_id, df)
+            response["job_id"] = job_id
+            logger.info(f"Scheduled ingestion job {job_id}")
+        else:
+            # Ingest into vector DB
+            result = await asyncio.to_thread(ingest_dataset, dataset_id, df)
+            
+            if not result.get("success"):
+                raise HTTPException(status_code=500, detail=result.get("error", "Ingestion failed"))
+            
+            logger.info(f"Ingestion completed: {result}")
+            response["ingest_result"] = result
+        
         # Add cleaning report if cleaning was performed
         if cleaning_report:
             response["cleaning_report"] = cleaning_report
-            response["cleaning_summary"] = cleaner.get_cleaning_summary()
+            response["cleaning_summary"] = cleaning_summary
         
         return response
         
@@ -136,6 +255,34 @@ async def ingest(file: UploadFile = File(...), auto_clean: bool = True):
         logger.error(f"Error during ingestion: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/ingest/status/{job_id}")
+def ingest_status(job_id: str):
+    """
+    Get the status of a background ingestion job.
+    
+    Returns:
+        - job_id: str
+        - status: pending | running | completed | failed
+        - progress: float - fraction of rows embedded (0.0-1.0)
+        - ingest_result: dict (when completed)
+        - error: str (when failed)
+    """
+    job = INGEST_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return job
+
+@app.get("/ingest/arrow/{dataset_id}")
+def ingest_arrow(dataset_id: str):
+    """
+    Get the cleaned DataFrame of an ingested file as an Arrow IPC stream,
+    so clients don't have to parse and clean the upload again.
+    """
+    df = INGESTED_DATASETS.get(dataset_id)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+    return Response(content=dataframe_to_arrow_ipc(df), media_type="application/vnd.apache.arrow.stream")
+
 @app.post("/data-quality")
 async def check_data_quality(file: UploadFile = File(...)):
     """
@@ -193,6 +340,39 @@ def query(req: QueryRequest):
         logger.error(f"Error during query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_events(chunks, error_prefix):
+    """
+    Frame text chunks as server-sent events, each `data:` line a JSON string.
+    If `chunks` raises, the stream ends with an `event: error` event whose
+    data is the error message, so clients can tell it apart from the text.
+    """
+    try:
+        for chunk in chunks:
+            yield f"data: {json.dumps(chunk)}\n\n"
+    except Exception as e:
+        logger.error(f"{error_prefix}: {str(e)}")
+        yield f"event: error\ndata: {json.dumps(f'{error_prefix}: {str(e)}')}\n\n"
+
+@app.post("/query/stream")
+def query_stream(req: QueryRequest):
+    """
+    Query the ingested data using RAG, streaming the answer as server-sent events.
+    
+    Args:
+        question: str - The question to ask
+        k: int - Number of relevant documents to retrieve (default: 4)
+    
+    Returns:
+        text/event-stream where each `data:` line is a JSON-encoded answer chunk;
+        a failure is sent as a final `event: error` event
+    """
+    logger.info(f"Received streaming query: {req.question}")
+    
+    return StreamingResponse(
+        sse_events(stream_query(req.question, k=req.k), "Error processing query"),
+        media_type="text/event-stream"
+    )
+
 @app.post("/insights")
 def insights(req: InsightsRequest):
     """
@@ -221,6 +401,26 @@ def insights(req: InsightsRequest):
         logger.error(f"Error generating insights: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/insights/stream")
+def insights_stream(req: InsightsRequest):
+    """
+    Generate business insights, streaming the text as server-sent events.
+    
+    Args:
+        df_summary: dict - DataFrame summary with statistics
+        k: int - Number of insights to generate (default: 6)
+    
+    Returns:
+        text/event-stream where each `data:` line is a JSON-encoded text chunk;
+        a failure is sent as a final `event: error` event
+    """
+    logger.info(f"Streaming {req.k} insights")
+    
+    return StreamingResponse(
+        sse_events(stream_insights(req.df_summary, k=req.k), "Error generating insights"),
+        media_type="text/event-stream"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,9 +1,10 @@
 import os
+import functools
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from backend.vectorstore import get_embeddings, init_chroma
+from backend.vectorstore import get_embeddings, init_chroma, get_store_generation
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,12 +12,24 @@ load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.0"))
 
+QUERY_TEMPLATE = """You are a data analyst assistant. Answer the question based on the following data context.
+
+Context:
+{context}
+
+Question: {question}
+
+Provide a clear, concise answer with specific data points when available. If you cannot answer based on the context, say so.
+
+Answer:"""
+
 def format_docs(docs):
     """Format retrieved documents into a single context string."""
     return "\n\n".join(doc.page_content for doc in docs)
 
+@functools.lru_cache(maxsize=1)
 def get_llm():
-    """Initialize Groq LLM."""
+    """Initialize Groq LLM (one client per process)."""
     return ChatGroq(
         model="llama-3.3-70b-versatile", 
         temperature=LLM_TEMPERATURE,
@@ -24,6 +37,27 @@ def get_llm():
         max_tokens=2048
     )
 
+@functools.lru_cache(maxsize=1)
+def get_query_prompt():
+    """Parse the RAG prompt template once."""
+    return ChatPromptTemplate.from_template(QUERY_TEMPLATE)
+
+@functools.lru_cache(maxsize=8)
+def get_query_chain(k, store_generation):
+    """
+    Build the RAG chain for a given k.
+    Cached per (k, store_generation) so a cleared store gets a fresh retriever.
+    """
+    vectordb = init_chroma(embedding_fn=get_embeddings())
+    retriever = vectordb.as_retriever(search_kwargs={"k": k})
+    
+    return (
+        {"context": retriever | format_docs, "question": RunnablePassthrough()}
+        | get_query_prompt()
+        | get_llm()
+        | StrOutputParser()
+    )
+
 def run_query(query, k=4):
     """
     Run a RAG query against the vector store.
@@ -36,35 +70,7 @@ def run_query(query, k=4):
         Answer string
     """
     try:
-        # Initialize components
-        embeddings = get_embeddings()
-        vectordb = init_chroma(embedding_fn=embeddings)
-        retriever = vectordb.as_retriever(search_kwargs={"k": k})
-        
-        # Initialize LLM
-        llm = get_llm()
-        
-        # Create prompt template
-        template = """You are a data analyst assistant. Answer the question based on the following data context.
-
-Context:
-{context}
-
-Question: {question}
-
-Provide a clear, concise answer with specific data points when available. If you cannot answer based on the context, say so.
-
-Answer:"""
-        
-        prompt = ChatPromptTemplate.from_template(template)
-        
-        # Create RAG chain
-        chain = (
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
+        chain = get_query_chain(k, get_store_generation())
         
         # Run the chain
         result = chain.invoke(query)
@@ -73,27 +79,40 @@ Answer:"""
     except Exception as e:
         return f"Error processing query: {str(e)}"
 
-def generate_insights(df_summary, k=6):
+def stream_query(query, k=4):
     """
-    Generate business insights from data summary.
+    Run a RAG query and yield the answer as it is generated.
     
     Args:
-        df_summary: Dictionary containing DataFrame summary statistics
-        k: Number of insights to generate
+        query: User's question
+        k: Number of documents to retrieve
     
-    Returns:
-        Formatted insights string
+    Yields:
+        Answer text chunks
+    
+    Errors are raised, not yielded, so callers can report them apart
+    from the answer text.
     """
-    try:
-        llm = get_llm()
-        
-        prompt = f"""You are a business intelligence analyst. Based on the data summary below, generate {k} actionable business insights.
+    chain = get_query_chain(k, get_store_generation())
+    
+    for chunk in chain.stream(query):
+        yield chunk
+
+def build_insights_prompt(df_summary, k=6):
+    """
+    Build the business-insights prompt for a DataFrame summary. Accepts the
+    full summary or the frontend's compact digest (dtypes_hist/top_missing
+    in place of the per-column dtypes/missing_values).
+    """
+    dtypes = df_summary.get('dtypes_hist', df_summary.get('dtypes', {}))
+    missing = df_summary.get('top_missing', df_summary.get('missing_values', {}))
+    return f"""You are a business intelligence analyst. Based on the data summary below, generate {k} actionable business insights.
 
 Data Summary:
 - Shape: {df_summary.get('shape', 'N/A')}
 - Columns: {', '.join(df_summary.get('columns', []))}
-- Data Types: {df_summary.get('dtypes', {})}
-- Missing Values: {df_summary.get('missing_values', {})}
+- Data Types: {dtypes}
+- Missing Values: {missing}
 - Statistics: {df_summary.get('summary_stats', {})}
 
 For each insight:
@@ -109,9 +128,42 @@ Format each insight as:
 **Action:** [recommended action]
 
 Generate {k} insights:"""
+
+def generate_insights(df_summary, k=6):
+    """
+    Generate business insights from data summary.
+    
+    Args:
+        df_summary: Dictionary containing DataFrame summary statistics
+        k: Number of insights to generate
+    
+    Returns:
+        Formatted insights string
+    """
+    try:
+        llm = get_llm()
         
-        response = llm.invoke(prompt)
+        response = llm.invoke(build_insights_prompt(df_summary, k))
         return response.content
         
     except Exception as e:
-        return f"Error generating insights: {str(e)}"
\ No newline at end of file
+        return f"Error generating insights: {str(e)}"
+
+def stream_insights(df_summary, k=6):
+    """
+    Generate business insights, yielding the text as it is generated.
+    
+    Args:
+        df_summary: Dictionary containing DataFrame summary statistics
+        k: Number of insights to generate
+    
+    Yields:
+        Insights text chunks
+    
+    Errors are raised, not yielded, so callers can report them apart
+    from the insights text.
+    """
+    llm = get_llm()
+    
+    for chunk in llm.stream(build_insights_prompt(df_summary, k)):
+        yield chunk.content
@@ -1,115 +1,192 @@
 import pandas as pd
 import numpy as np
-from io import StringIO, BytesIO
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from io import BytesIO
 
-def df_to_passages(df, max_rows_per_passage=20):
+PASSAGE_METADATA_COLUMNS = ["start_row", "end_row", "num_rows"]
+
+# Text columns of uploaded files are held as Arrow-backed pandas strings
+ARROW_STRING_DTYPE = pd.StringDtype("pyarrow")
+ARROW_STRING_TYPES = {pa.string(): ARROW_STRING_DTYPE, pa.large_string(): ARROW_STRING_DTYPE}
+
+def df_to_passage_table(df, max_rows_per_passage=20, row_offset=0):
     """
-    Convert DataFrame rows into text passages for RAG.
+    Convert DataFrame rows into text passages for RAG, as an Arrow table
+    with columns text, start_row, end_row and num_rows.
+    `row_offset` is added to row positions when `df` is a slice of a
+    larger frame.
     Groups multiple rows into passages for better context.
     Larger batches = fewer documents = faster processing.
+    Row strings are built column-wise over the whole frame instead of
+    iterating rows in Python.
     """
-    passages = []
     total_rows = len(df)
     
-    for start_idx in range(0, total_rows, max_rows_per_passage):
-        end_idx = min(start_idx + max_rows_per_passage, total_rows)
-        chunk_df = df.iloc[start_idx:end_idx]
-        
-        # Create a readable text representation
-        text_parts = [f"Data rows {start_idx} to {end_idx-1}:\n"]
-        
-        for idx, row in chunk_df.iterrows():
-            row_text = f"Row {idx}: "
-            items = []
-            for col in df.columns:
-                val = row[col]
-                if pd.isna(val):
-                    val_str = "NULL"
-                else:
-                    val_str = str(val)
-                items.append(f"{col}={val_str}")
-            row_text += ", ".join(items)
-            text_parts.append(row_text)
-        
-        passage_text = "\n".join(text_parts)
-        
-        metadata = {
-            "start_row": int(start_idx),
-            "end_row": int(end_idx - 1),
-            "num_rows": int(end_idx - start_idx)
-        }
-        
-        passages.append({
-            "text": passage_text,
-            "metadata": metadata
-        })
+    # Stringify every cell once, marking missing values as NULL
+    str_df = df.astype(object).where(df.notna(), "NULL").astype(str)
+    
+    # Build "Row idx: col1=val1, col2=val2, ..." for all rows at once
+    row_strings = "Row " + df.index.astype(str).to_numpy(dtype=object) + ": "
+    for pos, col in enumerate(df.columns):
+        sep = f"{col}=" if pos == 0 else f", {col}="
+        row_strings = row_strings + sep + str_df.iloc[:, pos].to_numpy(dtype=object)
     
-    return passages
+    starts = np.arange(0, total_rows, max_rows_per_passage, dtype=np.int64)
+    ends = np.minimum(starts + max_rows_per_passage, total_rows)
+    
+    # Create a readable text representation
+    texts = [
+        "\n".join([
+            f"Data rows {start_idx + row_offset} to {end_idx - 1 + row_offset}:\n",
+            *row_strings[start_idx:end_idx]
+        ])
+        for start_idx, end_idx in zip(starts, ends)
+    ]
+    
+    return pa.table({
+        "text": pa.array(texts, type=pa.large_string()),
+        "start_row": pa.array(starts + row_offset, type=pa.int64()),
+        "end_row": pa.array(ends - 1 + row_offset, type=pa.int64()),
+        "num_rows": pa.array(ends - starts, type=pa.int32())
+    })
+
+def iter_passage_tables(df, max_rows_per_passage=20, passages_per_batch=256):
+    """
+    Yield passage tables (see df_to_passage_table) for successive slices of
+    the DataFrame, at most `passages_per_batch` passages each, so only one
+    slice of passage text exists at a time.
+    """
+    rows_per_batch = max_rows_per_passage * passages_per_batch
+    for start in range(0, len(df), rows_per_batch):
+        yield df_to_passage_table(
+            df.iloc[start:start + rows_per_batch],
+            max_rows_per_passage,
+            row_offset=start
+        )
+
+def df_to_passages(df, max_rows_per_passage=20):
+    """
+    Convert DataFrame rows into text passages for RAG.
+    Returns a list of {"text": ..., "metadata": {...}} dicts; see
+    df_to_passage_table for the columnar form used during ingestion.
+    """
+    table = df_to_passage_table(df, max_rows_per_passage)
+    return [
+        {"text": text, "metadata": metadata}
+        for text, metadata in zip(
+            table.column("text").to_pylist(),
+            table.select(PASSAGE_METADATA_COLUMNS).to_pylist()
+        )
+    ]
 
 def read_uploaded_file_bytes(file_bytes, filename):
     """
     Read uploaded file (CSV or Excel) and return pandas DataFrame.
+    CSVs are parsed straight from the bytes by Arrow's multithreaded reader;
+    pandas' parser is used as a fallback when Arrow's type inference fails
+    or the header repeats a column name.
+    Text columns come back as Arrow-backed strings; numeric and datetime
+    columns keep numpy dtypes.
     """
     try:
         if filename.lower().endswith('.csv'):
-            s = StringIO(file_bytes.decode('utf-8'))
-            df = pd.read_csv(s)
+            try:
+                table = pa_csv.read_csv(
+                    pa.BufferReader(file_bytes),
+                    read_options=pa_csv.ReadOptions(use_threads=True, block_size=8 << 20),
+                    convert_options=pa_csv.ConvertOptions(strings_can_be_null=True)
+                )
+            except pa.ArrowInvalid:
+                table = None
+            
+            if table is not None and len(set(table.column_names)) == table.num_columns:
+                df = table.to_pandas(
+                    self_destruct=True,
+                    date_as_object=False,
+                    types_mapper=ARROW_STRING_TYPES.get
+                )
+            else:
+                # Arrow's inference failed, or headers repeat (pandas renames them a, a.1)
+                df = pd.read_csv(BytesIO(file_bytes))
         elif filename.lower().endswith(('.xlsx', '.xls')):
             df = pd.read_excel(BytesIO(file_bytes))
         else:
             raise ValueError(f"Unsupported file format: {filename}")
+        
+        # Keep text in Arrow-backed strings rather than Python object arrays
+        text_cols = df.select_dtypes(include='object').columns
+        if len(text_cols) > 0:
+            df[text_cols] = df[text_cols].astype(ARROW_STRING_DTYPE)
         return df
     except Exception as e:
         raise Exception(f"Error reading file: {str(e)}")
 
-def sanitize_for_json(obj):
+def dataframe_to_arrow_ipc(df):
     """
-    Recursively sanitize objects for JSON serialization.
-    Converts NaN, Infinity, and other non-JSON-compliant values.
+    Serialize a DataFrame (without its index) to Arrow IPC stream bytes.
+    Object columns holding mixed types Arrow cannot unify are sent as strings.
     """
-    if isinstance(obj, dict):
-        return {key: sanitize_for_json(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_for_json(item) for item in obj]
-    elif isinstance(obj, (np.integer, np.int64, np.int32)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64, np.float32)):
-        if np.isnan(obj) or np.isinf(obj):
-            return None
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return sanitize_for_json(obj.tolist())
-    elif pd.isna(obj):
-        return None
-    elif isinstance(obj, (float, int)):
-        if isinstance(obj, float) and (np.isnan(obj) or np.isinf(obj)):
-            return None
-        return obj
-    else:
-        return obj
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed_cols = df.select_dtypes(include='object').columns
+        table = pa.Table.from_pandas(
+            df.astype({col: ARROW_STRING_DTYPE for col in mixed_cols}),
+            preserve_index=False
+        )
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
 
 def get_dataframe_summary(df):
     """
     Generate a comprehensive summary of the DataFrame.
-    All values are sanitized for JSON serialization.
+    All values are converted to JSON-safe Python types in bulk:
+    NaN and Infinity become None, numpy scalars become int/float.
     """
+    dtypes = df.dtypes.astype(str)
+    missing = df.isnull().sum()
     summary = {
-        "shape": df.shape,
+        "shape": [int(n) for n in df.shape],
         "columns": list(df.columns),
-        "dtypes": df.dtypes.astype(str).to_dict(),
-        "missing_values": df.isnull().sum().to_dict(),
+        "dtypes": dtypes.to_dict(),
+        "missing_values": {col: int(n) for col, n in missing.items()},
+        # Ready-to-display rows for the frontend's column details table
+        "column_details": [
+            {"column": col, "dtype": dtype, "missing": int(n)}
+            for col, dtype, n in zip(df.columns, dtypes, missing)
+        ],
+        # Columns the frontend can chart
+        "numeric_columns": [
+            col for col, dtype in df.dtypes.items() if pd.api.types.is_numeric_dtype(dtype)
+        ],
+        "datetime_columns": [
+            col for col, dtype in df.dtypes.items() if pd.api.types.is_datetime64_any_dtype(dtype)
+        ],
     }
     
-    # Get summary statistics for numeric columns
+    # Get summary statistics for numeric and datetime columns (describe()'s default)
     if len(df.select_dtypes(include='number').columns) > 0:
-        stats_df = df.describe()
-        # Convert to dict and sanitize
-        summary_stats = stats_df.to_dict()
-        summary["summary_stats"] = sanitize_for_json(summary_stats)
+        described = df.select_dtypes(include=['number', 'datetime'])
+        # Columns downcast to float32 by the cleaner would also be summed in float32
+        float32_cols = described.select_dtypes(include='float32').columns
+        stats_df = (
+            described.astype({col: np.float64 for col in float32_cols}).describe()
+            .replace([np.inf, -np.inf], np.nan)
+        )
+        # object dtype holds Python floats; timestamps become ISO strings
+        stats_obj = stats_df.astype(object)
+        for col in described.select_dtypes(include='datetime').columns:
+            stats_obj[col] = [
+                value.isoformat() if isinstance(value, pd.Timestamp) else value
+                for value in stats_obj[col]
+            ]
+        # Missing stats (NaN/NaT) become None
+        summary["summary_stats"] = stats_obj.where(stats_df.notna(), None).to_dict()
     else:
         summary["summary_stats"] = {}
     
-    # Sanitize the entire summary to ensure JSON compliance
-    summary = sanitize_for_json(summary)
-    
     return summary
\ No newline at end of file
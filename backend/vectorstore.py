@@ -1,20 +1,188 @@
 import os
 import shutil
 import gc
+import functools
+import logging
+import uuid
+import numpy as np
+import torch
+import chromadb
+from chromadb.config import Settings
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_model")
+# CPU threads used by the embedding model (ONNX Runtime or torch)
+EMBED_NUM_THREADS = int(os.getenv("EMBED_NUM_THREADS", str(os.cpu_count() or 1)))
+# Opt-in torch.compile of the torch embedding model
+EMBEDDING_TORCH_COMPILE = os.getenv("EMBEDDING_TORCH_COMPILE", "false").lower() == "true"
+# Rows per collection.add call; large inserts keep HNSW updates cheap
+CHROMA_ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "5000"))
+
+# Bumped whenever the store is wiped so cached retrievers get rebuilt
+_store_generation = 0
+
+def get_store_generation():
+    """Return a counter that changes every time the vector store is cleared."""
+    return _store_generation
+
+class InferenceModeEmbeddings(HuggingFaceEmbeddings):
+    """HuggingFace embeddings that encode under torch.inference_mode()."""
+    
+    def embed_documents(self, texts):
+        with torch.inference_mode():
+            return super().embed_documents(texts)
+    
+    def embed_query(self, text):
+        with torch.inference_mode():
+            return super().embed_query(text)
+
+class OnnxInt8Embeddings(Embeddings):
+    """
+    MiniLM embeddings served by ONNX Runtime with dynamic int8 quantization.
+    
+    The model is exported and quantized into `model_dir` on first use and
+    loaded from there afterwards. Mean pooling and L2 normalization match
+    the sentence-transformers model, so vectors are interchangeable up to
+    quantization error.
+    """
+    
+    QUANTIZED_FILE = "model_quantized.onnx"
+    
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, model_dir=ONNX_MODEL_DIR,
+                 batch_size=EMBED_BATCH_SIZE, max_length=256):
+        import onnxruntime as ort
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+        
+        if not os.path.exists(os.path.join(model_dir, self.QUANTIZED_FILE)):
+            logger.info(f"Exporting {model_name} to int8 ONNX in {model_dir}")
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            model.save_pretrained(model_dir)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+            
+            quantizer = ORTQuantizer.from_pretrained(model_dir)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=model_dir, quantization_config=qconfig)
+        
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = EMBED_NUM_THREADS
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir,
+            file_name=self.QUANTIZED_FILE,
+            provider="CPUExecutionProvider",
+            session_options=session_options
+        )
+        self.batch_size = batch_size
+        self.max_length = max_length
+    
+    def _encode(self, texts):
+        """
+        Encode texts in batches; returns an (n, dim) float32 array.
+        
+        Texts are tokenized once, sorted by token length and batched so
+        each batch is padded only to its own longest member. Rows are put
+        back in input order before returning.
+        """
+        if not texts:
+            return np.empty((0, self.model.config.hidden_size), dtype=np.float32)
+        
+        encoded = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.max_length,
+            return_length=True
+        )
+        lengths = np.asarray(encoded.pop("length"))
+        order = np.argsort(lengths, kind="stable")
+        
+        vectors = np.empty((len(texts), self.model.config.hidden_size), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            inputs = self.tokenizer.pad(
+                {key: [values[i] for i in idx] for key, values in encoded.items()},
+                return_tensors="np"
+            )
+            token_embeddings = self.model(**inputs).last_hidden_state
+            
+            # Mean pooling over real tokens, then L2 normalize
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors[idx] = pooled
+        
+        return vectors
+    
+    def embed_documents(self, texts):
+        return self._encode(list(texts)).tolist()
+    
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
 
+@functools.lru_cache(maxsize=1)
 def get_embeddings():
-    """Initialize FREE HuggingFace embeddings (no API key needed)."""
-    return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
+    """
+    Initialize FREE HuggingFace embeddings (no API key needed).
+    The model is loaded once per process and shared by all callers.
+    
+    EMBEDDING_BACKEND=onnx (default) serves an int8-quantized ONNX export
+    on CPU; EMBEDDING_BACKEND=torch, a GPU, or a missing optimum install
+    uses the sentence-transformers model.
+    """
+    use_cuda = torch.cuda.is_available()
+    if EMBEDDING_BACKEND == "onnx" and not use_cuda:
+        try:
+            return OnnxInt8Embeddings()
+        except ImportError as e:
+            logger.warning(f"ONNX embeddings unavailable ({str(e)}), using torch")
+    
+    if not use_cuda:
+        torch.set_num_threads(EMBED_NUM_THREADS)
+    
+    embeddings = InferenceModeEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cuda' if use_cuda else 'cpu'},
+        encode_kwargs={
+            'normalize_embeddings': True,
+            'batch_size': EMBED_BATCH_SIZE
+        },
+        show_progress=False
+    )
+    
+    if EMBEDDING_TORCH_COMPILE:
+        # Compile the transformer inside the SentenceTransformer so .encode() still works
+        try:
+            transformer = embeddings.client[0]
+            transformer.auto_model = torch.compile(transformer.auto_model, dynamic=True)
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable ({str(e)}), using eager model")
+    
+    return embeddings
+
+@functools.lru_cache(maxsize=4)
+def get_chroma_client(persist_directory):
+    """
+    Return the persistent Chroma client for a directory, opened once per
+    process so sqlite and the HNSW index are loaded only once. Reset is
+    enabled so the store can be wiped in place.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    return chromadb.PersistentClient(
+        path=persist_directory,
+        settings=Settings(allow_reset=True, anonymized_telemetry=False)
     )
 
 def init_chroma(persist_directory=None, embedding_fn=None):
@@ -25,21 +193,55 @@ def init_chroma(persist_directory=None, embedding_fn=None):
         embedding_fn = get_embeddings()
     
     vectordb = Chroma(
-        persist_directory=persist_directory,
+        client=get_chroma_client(persist_directory),
         embedding_function=embedding_fn
     )
     return vectordb
 
+def add_documents_batched(vectordb, texts, embeddings, metadatas, batch_size=CHROMA_ADD_BATCH_SIZE):
+    """
+    Insert pre-embedded documents into the store's collection in large
+    chunks, bypassing Chroma's own embedding call. `embeddings` may be a
+    list of vectors or a 2-D array; arrays are converted one chunk at a time.
+    Chunks are capped at the client's max_batch_size.
+    
+    Returns:
+        Number of documents added
+    """
+    batch_size = min(batch_size, vectordb._client.max_batch_size)
+    collection = vectordb._collection
+    for start in range(0, len(texts), batch_size):
+        end = start + batch_size
+        collection.add(
+            ids=[str(uuid.uuid4()) for _ in range(start, min(end, len(texts)))],
+            embeddings=np.asarray(embeddings[start:end], dtype=np.float32).tolist(),
+            documents=texts[start:end],
+            metadatas=metadatas[start:end]
+        )
+    return len(texts)
+
 def clear_vectorstore(persist_directory=None):
+    global _store_generation
     if persist_directory is None:
         persist_directory = PERSIST_DIR
 
-    # Try removing
+    # Reset through the open client so sqlite and the index stay loaded
     try:
-        shutil.rmtree(persist_directory)
-    except Exception:
-        pass  # ignore any Windows permission errors
+        get_chroma_client(persist_directory).reset()
+    except Exception as e:
+        logger.warning(f"Chroma reset failed ({str(e)}), removing directory")
+        get_chroma_client.cache_clear()
 
-    # Always recreate same stable directory
-    os.makedirs(persist_directory, exist_ok=True)
+        # Try removing
+        try:
+            shutil.rmtree(persist_directory)
+        except Exception:
+            pass  # ignore any Windows permission errors
+
+        # Always recreate same stable directory
+        os.makedirs(persist_directory, exist_ok=True)
+    
+    # Bump only once the old collection is gone, so a query racing the wipe
+    # cannot cache a chain bound to it under the new generation
+    _store_generation += 1
     return persist_directory
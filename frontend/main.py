@@ -1,9 +1,14 @@
 import streamlit as st
-import requests
+import httpx
 import pandas as pd
-import plotly.express as px
-from io import BytesIO
+import numpy as np
+from collections import deque, Counter
+import json
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Page config
 st.set_page_config(
@@ -13,8 +18,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS, whitespace collapsed once at import. It is re-emitted on every
+# full rerun because Streamlit removes elements a rerun does not draw again;
+# fragment reruns (chat, insights, charts) skip it.
+_CUSTOM_CSS = re.sub(r"\s+", " ", """
 <style>
     .main-header {
         font-size: 3rem;
@@ -30,47 +37,331 @@ st.markdown("""
         margin-bottom: 2rem;
     }
 </style>
-""", unsafe_allow_html=True)
+""").strip()
+st.markdown(_CUSTOM_CSS, unsafe_allow_html=True)
 
 # API Configuration
 API_BASE_URL = os.getenv("API_URL", "http://localhost:8000")
+# Escape dollar signs to prevent LaTeX/math mode rendering
+_ESCAPE_DOLLAR = str.maketrans({'$': '\\$'})
+# One match per insight: from a "**Insight" heading up to the next one
+_INSIGHT_RE = re.compile(r'\*\*Insight.*?(?=\*\*Insight|\Z)', re.DOTALL)
+
+# Seconds between /ingest/status polls
+INGEST_POLL_INTERVAL = 1.0
+# Chat turns kept in the session; older ones are dropped
+CHAT_HISTORY_MAX = int(os.getenv("CHAT_HISTORY_MAX", "50"))
+# Streamed answers are cached on disk per (dataset, question, k) for this many seconds
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", ".rag_cache")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 86400)))
+# Suggested chat questions: (button label, question asked, widget key)
+SUGGESTED_QUESTIONS = (
+    ("📊 What are the main trends in the data?", "What are the main trends in the data?", "q1"),
+    ("📈 Show me summary statistics", "Show me summary statistics", "q2"),
+    ("🔍 What insights can you find?", "What insights can you find in this data?", "q3"),
+    ("❓ What columns have missing data?", "What columns have missing data?", "q4"),
+)
+
+@st.cache_resource
+def get_http_client():
+    """
+    Shared HTTP client so API calls reuse pooled keep-alive connections.
+    HTTP/2 is negotiated when the API is served over TLS, letting
+    concurrent calls multiplex on one connection.
+    """
+    return httpx.Client(
+        base_url=API_BASE_URL,
+        http2=True,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=4)
+    )
+
+@st.cache_resource(max_entries=3, show_spinner="Loading data...")
+def load_dataset(dataset_id):
+    """
+    Download the backend's cleaned DataFrame as an Arrow IPC stream.
+    st.tabs runs every tab body on each rerun, so the tabs only call this
+    once the user switches on the data preview or the charts; cached per
+    dataset_id.
+    """
+    import pyarrow as pa
+    
+    response = get_http_client().get(f"/ingest/arrow/{dataset_id}", timeout=120)
+    response.raise_for_status()
+    return pa.ipc.open_stream(response.content).read_all().to_pandas(self_destruct=True)
+
+def get_current_dataset():
+    """
+    Load the current upload's DataFrame, or warn and return None when the
+    backend no longer holds it (evicted by newer uploads, or restarted).
+    """
+    try:
+        return load_dataset(st.session_state.dataset_id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 404:
+            raise
+        st.warning("⚠️ This dataset is no longer available on the server. Please process the file again.")
+        return None
+
+def wait_for_ingest(job_id, progress_bar):
+    """
+    Poll a background ingestion job until it finishes, updating `progress_bar`.
+    Returns the job's ingest_result; raises if the job failed.
+    """
+    while True:
+        response = get_http_client().get(f"/ingest/status/{job_id}", timeout=30)
+        response.raise_for_status()
+        job = response.json()
+        
+        progress_bar.progress(job.get('progress', 0.0), text=f"Embedding data ({job['status']})...")
+        if job['status'] == 'completed':
+            return job['ingest_result']
+        if job['status'] == 'failed':
+            raise RuntimeError(job.get('error', 'Ingestion failed'))
+        time.sleep(INGEST_POLL_INTERVAL)
+
+# Helpers derived from a loaded dataset are cached on its dataset_id (a hash
+# of the upload); the frame itself is passed as `_df` so it is never hashed.
+
+@st.cache_data(max_entries=3)
+def _arrow_preview(dataset_id, _df, n=20):
+    """First `n` rows as an Arrow table, converted once per dataset for st.dataframe."""
+    import pyarrow as pa
+    
+    return pa.Table.from_pandas(_df.head(n), preserve_index=False)
+
+# Rows sampled for the correlation heatmap; Pearson estimates are stable well before this
+CORR_SAMPLE_ROWS = 100_000
+
+@st.cache_data(max_entries=3, show_spinner=False)
+def _corr(dataset_id, _df, cols):
+    """
+    Correlation matrix of `cols`, computed with np.corrcoef when there are
+    no gaps. Frames larger than CORR_SAMPLE_ROWS are sampled
+    (deterministically) first. Columns are copied straight into one float64
+    block rather than through an intermediate DataFrame of the selected
+    columns; float64 is what np.corrcoef works in anyway, and float32 loses
+    precision on large-magnitude columns.
+    """
+    rows = None
+    if len(_df) > CORR_SAMPLE_ROWS:
+        rows = np.sort(np.random.default_rng(0).choice(len(_df), CORR_SAMPLE_ROWS, replace=False))
+    
+    values = np.empty((len(_df) if rows is None else len(rows), len(cols)), dtype=np.float64)
+    for j, col in enumerate(cols):
+        series = _df[col] if rows is None else _df[col].take(rows)
+        values[:, j] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    if np.isnan(values).any():
+        # Pairwise-complete correlation needs pandas
+        return pd.DataFrame(values, columns=cols).corr()
+    return pd.DataFrame(np.corrcoef(values, rowvar=False), index=cols, columns=cols)
+
+def build_overview(data_summary):
+    """
+    Precompute the Data Overview metrics and column details table once per
+    upload, so reruns only read them from session state.
+    """
+    col_details = pd.DataFrame.from_records(
+        data_summary['column_details'],
+        columns=['column', 'dtype', 'missing']
+    ).rename(columns={'column': 'Column', 'dtype': 'Data Type', 'missing': 'Missing Values'})
+    
+    metrics = {
+        'rows': data_summary['shape'][0],
+        'cols': data_summary['shape'][1],
+        'missing': int(col_details['Missing Values'].sum()),
+        'numeric': int(col_details['Data Type'].str.startswith(('int', 'uint', 'float')).sum())
+    }
+    return metrics, col_details
+
+# Columns listed (and described) in the insights digest
+INSIGHTS_MAX_COLUMNS = 20
+
+def build_insights_digest(data_summary):
+    """
+    Compact version of the data summary sent to /insights: the shape, a
+    dtype histogram, the most-missing columns and statistics for at most
+    INSIGHTS_MAX_COLUMNS columns, instead of per-column dicts for every column.
+    """
+    missing = sorted(data_summary['missing_values'].items(), key=lambda item: -item[1])
+    stats = data_summary.get('summary_stats', {})
+    return {
+        'shape': data_summary['shape'],
+        'columns': data_summary['columns'][:INSIGHTS_MAX_COLUMNS],
+        'dtypes_hist': dict(Counter(data_summary['dtypes'].values())),
+        'top_missing': [[col, n] for col, n in missing[:INSIGHTS_MAX_COLUMNS] if n > 0],
+        'summary_stats': {col: stats[col] for col in list(stats)[:INSIGHTS_MAX_COLUMNS]}
+    }
+
+HISTOGRAM_BINS = 50
+TIME_SERIES_POINTS = 2000
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _histogram(dataset_id, _df, col, bins=HISTOGRAM_BINS):
+    """Bin a numeric column; returns (bin centers, bin widths, counts)."""
+    values = _df[col].dropna().to_numpy(dtype=np.float64)
+    counts, edges = np.histogram(values, bins=bins)
+    return (edges[:-1] + edges[1:]) / 2, np.diff(edges), counts
+
+def _lttb(x, y, n_out):
+    """Largest-triangle-three-buckets downsampling of a sorted series to `n_out` points."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[end:nxt_end].mean(), y[end:nxt_end].mean()
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _time_series(dataset_id, _df, date_col, value_col, n_out=TIME_SERIES_POINTS):
+    """Sort a date/value pair by date and downsample it with LTTB for plotting."""
+    series = _df[[date_col, value_col]].dropna().sort_values(date_col)
+    dates = series[date_col].to_numpy()
+    values = series[value_col].to_numpy(dtype=np.float64)
+    keep = _lttb(dates.astype("datetime64[ns]").astype(np.int64).astype(np.float64), values, n_out)
+    return dates[keep], values[keep]
+
+# Figures are cached per (dataset, column) so selectbox changes reuse them.
+# plotly is only needed for these; it is imported on first use. They are
+# built on worker threads, so they must not draw a cache spinner.
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _histogram_figure(dataset_id, _df, col):
+    """Bar chart of a column's pre-computed histogram."""
+    import plotly.graph_objects as go
+    
+    centers, widths, counts = _histogram(dataset_id, _df, col)
+    fig = go.Figure(go.Bar(x=centers, y=counts, width=widths))
+    fig.update_layout(title=f"Distribution of {col}",
+                      xaxis_title=col, yaxis_title="count", bargap=0)
+    return fig
+
+@st.cache_data(max_entries=3, show_spinner=False)
+def _heatmap_figure(dataset_id, _df, cols):
+    """Correlation heatmap of `cols`."""
+    import plotly.express as px
+    
+    return px.imshow(_corr(dataset_id, _df, cols), 
+                     text_auto=True,
+                     title="Correlation Matrix",
+                     color_continuous_scale='RdBu_r')
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _time_series_figure(dataset_id, _df, date_col, value_col):
+    """Line chart of a downsampled date/value series."""
+    import plotly.express as px
+    
+    dates, values = _time_series(dataset_id, _df, date_col, value_col)
+    return px.line(x=dates, y=values, title=f"{value_col} over time",
+                   labels={'x': date_col, 'y': value_col})
 
 # Initialize session state
 if 'data_uploaded' not in st.session_state:
     st.session_state.data_uploaded = False
-if 'df' not in st.session_state:
-    st.session_state.df = None
-if 'data_summary' not in st.session_state:
-    st.session_state.data_summary = None
+if 'dataset_id' not in st.session_state:
+    st.session_state.dataset_id = None
+if 'insights_digest' not in st.session_state:
+    st.session_state.insights_digest = None
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'pending_question' not in st.session_state:
-    st.session_state.pending_question = None
+    st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_MAX)
 if 'cleaning_summary' not in st.session_state:
     st.session_state.cleaning_summary = None
+if 'metrics' not in st.session_state:
+    st.session_state.metrics = None
+if 'column_details' not in st.session_state:
+    st.session_state.column_details = None
+if 'numeric_cols' not in st.session_state:
+    st.session_state.numeric_cols = ()
+if 'date_cols' not in st.session_state:
+    st.session_state.date_cols = ()
 
 # Function to process query
-def process_query(question, k_value):
-    """Process a query and return the answer."""
-    try:
-        response = requests.post(
-            f"{API_BASE_URL}/query",
-            json={"question": question, "k": k_value},
-            timeout=60
-        )
+def stream_events(path, payload):
+    """
+    POST to a streaming (SSE) endpoint and yield its text chunks with dollar
+    signs escaped. An `event: error` event from the backend is raised as
+    RuntimeError, so a failed answer is never returned (or cached) as text.
+    """
+    with get_http_client().stream(
+        "POST",
+        path,
+        json=payload,
+        timeout=httpx.Timeout(120, connect=5)
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(response.read().decode())
         
-        if response.status_code == 200:
-            result = response.json()
-            answer = result['answer']
-            
-            # Fix: Escape dollar signs to prevent LaTeX/math mode rendering
-            answer = answer.replace('$', '\\$')
-            
-            return answer, None
-        else:
-            return None, f"Error: {response.text}"
-    except Exception as e:
-        return None, f"Error: {str(e)}"
+        event = 'message'
+        for line in response.iter_lines():
+            if not line:
+                event = 'message'
+            elif line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                if event == 'error':
+                    raise RuntimeError(json.loads(line[6:]))
+                yield json.loads(line[6:]).translate(_ESCAPE_DOLLAR)
+
+def stream_query(question, k_value):
+    """Stream the answer to a query from the backend, yielding text chunks."""
+    return stream_events("/query/stream", {"question": question, "k": k_value})
+
+@st.cache_resource
+def get_response_cache():
+    """On-disk cache of streamed answers, shared by all sessions."""
+    import diskcache
+    
+    return diskcache.Cache(RESPONSE_CACHE_DIR)
+
+def cached_stream(key, chunks):
+    """
+    Yield the cached answer for `key` if there is one; otherwise yield from
+    `chunks` and cache the full text once the stream completes.
+    """
+    cache = get_response_cache()
+    text = cache.get(key)
+    if text is not None:
+        yield text
+        return
+    
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if parts:
+        cache.set(key, "".join(parts), expire=RESPONSE_CACHE_TTL)
+
+def ask(question, k_value):
+    """Show a question in the chat and stream its answer; returns the answer, or None on error."""
+    with st.chat_message("user"):
+        st.write(question)
+    
+    with st.chat_message("assistant"):
+        try:
+            answer = st.write_stream(cached_stream(
+                ("query", st.session_state.dataset_id, question, k_value),
+                stream_query(question, k_value)
+            ))
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+            return None
+    
+    st.session_state.chat_history.append({
+        'question': question,
+        'answer': answer
+    })
+    return answer
 
 # Header
 st.markdown('<div class="main-header">📊 Data-to-Insights RAG Agent</div>', unsafe_allow_html=True)
@@ -90,10 +381,12 @@ with st.sidebar:
         if st.button("🚀 Process Data", use_container_width=True):
             with st.spinner("Processing your data..."):
                 try:
-                    files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+                    # Stream the upload from the file object instead of copying its bytes
+                    uploaded_file.seek(0)
+                    files = {'file': (uploaded_file.name, uploaded_file, uploaded_file.type)}
                     
-                    response = requests.post(
-                        f"{API_BASE_URL}/ingest", 
+                    response = get_http_client().post(
+                        "/ingest", 
                         files=files,
                         timeout=600
                     )
@@ -101,19 +394,24 @@ with st.sidebar:
                     if response.status_code == 200:
                         result = response.json()
                         
+                        # Embedding runs as a background job on the backend
+                        progress_bar = st.progress(0.0, text="Embedding data...")
+                        ingest_result = wait_for_ingest(result['job_id'], progress_bar)
+                        progress_bar.empty()
+                        
                         st.session_state.data_uploaded = True
                         
-                        if uploaded_file.name.endswith('.csv'):
-                            st.session_state.df = pd.read_csv(BytesIO(uploaded_file.getvalue()))
-                        else:
-                            st.session_state.df = pd.read_excel(BytesIO(uploaded_file.getvalue()))
+                        st.session_state.dataset_id = result['dataset_id']
                         
-                        st.session_state.data_summary = result['data_summary']
+                        st.session_state.insights_digest = build_insights_digest(result['data_summary'])
+                        st.session_state.metrics, st.session_state.column_details = build_overview(result['data_summary'])
+                        st.session_state.numeric_cols = tuple(result['data_summary']['numeric_columns'])
+                        st.session_state.date_cols = tuple(result['data_summary']['datetime_columns'])
                         
                         if 'cleaning_summary' in result:
                             st.session_state.cleaning_summary = result.get('cleaning_summary', '')
                         
-                        st.success(f"✅ Successfully processed {result['ingest_result']['rows_processed']} rows!")
+                        st.success(f"✅ Successfully processed {ingest_result['rows_processed']} rows!")
                         
                         if 'cleaning_summary' in result:
                             with st.expander("🧹 Data Cleaning Summary", expanded=True):
@@ -123,7 +421,7 @@ with st.sidebar:
                     else:
                         st.error(f"❌ Error: {response.text}")
                         
-                except requests.exceptions.Timeout:
+                except httpx.TimeoutException:
                     st.error("❌ Request timed out. Please try again.")
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
@@ -151,6 +449,169 @@ with st.sidebar:
     - 💬 Chat interface
     """)
 
+# Tab 1: Data Overview
+@st.fragment
+def _tab_overview():
+    """Dataset metrics, preview and column details."""
+    st.header("📊 Data Overview")
+    
+    if st.session_state.cleaning_summary:
+        with st.expander("🧹 Data Cleaning Report", expanded=False):
+            st.code(st.session_state.cleaning_summary, language="text")
+    
+    metrics = st.session_state.metrics
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Total Rows", metrics['rows'])
+    with col2:
+        st.metric("Total Columns", metrics['cols'])
+    with col3:
+        st.metric("Missing Values", metrics['missing'])
+    with col4:
+        st.metric("Numeric Columns", metrics['numeric'])
+    
+    st.divider()
+    
+    st.subheader("🔍 Data Preview")
+    # Downloading the data waits for an explicit request
+    if st.toggle("Show data preview", key="show_preview"):
+        df = get_current_dataset()
+        if df is not None:
+            st.dataframe(_arrow_preview(st.session_state.dataset_id, df), use_container_width=True)
+    
+    st.subheader("📋 Column Details")
+    st.dataframe(st.session_state.column_details, use_container_width=True)
+
+# Tab 2: Chat & Query
+@st.fragment
+def _tab_chat(k_value):
+    """Chat history, suggested questions and the chat input."""
+    col_header, col_clear = st.columns([4, 1])
+    with col_header:
+        st.header("💬 Chat with Your Data")
+    with col_clear:
+        if len(st.session_state.chat_history) > 0:
+            if st.button("🗑️ Clear Chat", use_container_width=True):
+                st.session_state.chat_history.clear()
+                st.rerun(scope="fragment")
+    
+    # Chat history
+    for chat in st.session_state.chat_history:
+        with st.chat_message("user"):
+            st.write(chat['question'])
+        with st.chat_message("assistant"):
+            st.write(chat['answer'])
+    
+    # Suggested questions, answered in place on click
+    if len(st.session_state.chat_history) == 0:
+        clicked = None
+        suggestions = st.empty()
+        
+        with suggestions.container():
+            st.subheader("💡 Suggested Questions")
+            st.caption("Click any question below to get started:")
+            cols = st.columns(2)
+            
+            # First two questions fill the left column, the rest the right
+            for i, (label, question, key) in enumerate(SUGGESTED_QUESTIONS):
+                if cols[i // 2].button(label, use_container_width=True, key=key):
+                    clicked = question
+            
+            st.divider()
+        
+        if clicked:
+            suggestions.empty()
+            ask(clicked, k_value)
+    
+    # Chat input
+    query = st.chat_input("Ask a question about your data...")
+    
+    if query:
+        ask(query, k_value)
+
+# Tab 3: Insights - FIXED!
+@st.fragment
+def _tab_insights():
+    """Generate and display AI business insights."""
+    st.header("💡 AI-Generated Business Insights")
+    
+    if st.button("🎯 Generate Insights", use_container_width=True):
+        try:
+            # Show the text as it streams in, then replace it with the sectioned view
+            placeholder = st.empty()
+            with placeholder.container():
+                insights_text = st.write_stream(cached_stream(
+                    ("insights", st.session_state.dataset_id, 6),
+                    stream_events("/insights/stream", {"df_summary": st.session_state.insights_digest, "k": 6})
+                ))
+            placeholder.empty()
+            
+            st.markdown("---")
+            
+            # Each "**Insight" section becomes its own expander
+            for idx, match in enumerate(_INSIGHT_RE.finditer(insights_text), 1):
+                with st.expander(f"💡 Insight {idx}", expanded=(idx <= 2)):
+                    # Render as markdown (not HTML) - this fixes the formatting!
+                    st.markdown(match.group(0).strip())
+            
+            st.markdown("---")
+            
+            st.download_button(
+                label="📥 Download Insights Report",
+                data=insights_text,
+                file_name="business_insights.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
+        except httpx.TimeoutException:
+            st.error("⏱️ Request timed out. Please try again.")
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+
+# Tab 4: Visualizations
+@st.fragment
+def _tab_visualizations():
+    """Distribution, correlation and time series charts."""
+    st.header("📈 Data Visualizations")
+    
+    # Downloading the data waits for an explicit request
+    if not st.toggle("Show charts", key="show_charts"):
+        return
+    
+    dataset_id = st.session_state.dataset_id
+    df = get_current_dataset()
+    if df is None:
+        return
+    numeric_cols = list(st.session_state.numeric_cols)
+    date_cols = list(st.session_state.date_cols)
+    
+    if len(numeric_cols) > 0:
+        # Lay out widgets and chart slots in order, building the figures concurrently
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(max_workers=3, initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+            charts = []
+            
+            st.subheader("📊 Distribution Analysis")
+            selected_col = st.selectbox("Select column", numeric_cols)
+            charts.append((st.empty(), executor.submit(_histogram_figure, dataset_id, df, selected_col)))
+            
+            if len(numeric_cols) > 1:
+                st.subheader("🔥 Correlation Heatmap")
+                charts.append((st.empty(), executor.submit(_heatmap_figure, dataset_id, df, numeric_cols)))
+            
+            if len(date_cols) > 0 and len(numeric_cols) > 0:
+                st.subheader("📅 Time Series Analysis")
+                date_col = st.selectbox("Select date column", date_cols)
+                value_col = st.selectbox("Select value column", numeric_cols)
+                charts.append((st.empty(), executor.submit(_time_series_figure, dataset_id, df, date_col, value_col)))
+            
+            for slot, figure in charts:
+                slot.plotly_chart(figure.result(), use_container_width=True)
+    else:
+        st.info("No numeric columns found for visualization.")
+
 # Main content
 if not st.session_state.data_uploaded:
     st.markdown("""
@@ -197,211 +658,17 @@ if not st.session_state.data_uploaded:
 else:
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Data Overview", "💬 Chat & Query", "💡 Insights", "📈 Visualizations"])
     
-    # Tab 1: Data Overview
     with tab1:
-        st.header("📊 Data Overview")
-        
-        if st.session_state.cleaning_summary:
-            with st.expander("🧹 Data Cleaning Report", expanded=False):
-                st.code(st.session_state.cleaning_summary, language="text")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Rows", st.session_state.data_summary['shape'][0])
-        with col2:
-            st.metric("Total Columns", st.session_state.data_summary['shape'][1])
-        with col3:
-            missing_count = sum(st.session_state.data_summary['missing_values'].values())
-            st.metric("Missing Values", missing_count)
-        with col4:
-            numeric_cols = len([k for k, v in st.session_state.data_summary['dtypes'].items() 
-                              if 'int' in v or 'float' in v])
-            st.metric("Numeric Columns", numeric_cols)
-        
-        st.divider()
-        
-        st.subheader("🔍 Data Preview")
-        st.dataframe(st.session_state.df.head(20), use_container_width=True)
-        
-        st.subheader("📋 Column Details")
-        col_details = pd.DataFrame({
-            'Column': st.session_state.data_summary['columns'],
-            'Data Type': [st.session_state.data_summary['dtypes'][col] 
-                         for col in st.session_state.data_summary['columns']],
-            'Missing Values': [st.session_state.data_summary['missing_values'][col] 
-                              for col in st.session_state.data_summary['columns']]
-        })
-        st.dataframe(col_details, use_container_width=True)
-    
-    # Tab 2: Chat & Query
+        _tab_overview()
+    
     with tab2:
-        col_header, col_clear = st.columns([4, 1])
-        with col_header:
-            st.header("💬 Chat with Your Data")
-        with col_clear:
-            if len(st.session_state.chat_history) > 0:
-                if st.button("🗑️ Clear Chat", use_container_width=True):
-                    st.session_state.chat_history = []
-                    st.rerun()
-        
-        # Process pending question
-        if st.session_state.pending_question:
-            query = st.session_state.pending_question
-            st.session_state.pending_question = None
-            
-            with st.spinner("Thinking..."):
-                answer, error = process_query(query, k_value)
-                
-                if answer:
-                    st.session_state.chat_history.append({
-                        'question': query,
-                        'answer': answer
-                    })
-                    st.rerun()
-                else:
-                    st.error(error)
-        
-        # Chat history
-        for chat in st.session_state.chat_history:
-            with st.chat_message("user"):
-                st.write(chat['question'])
-            with st.chat_message("assistant"):
-                st.write(chat['answer'])
-        
-        # Suggested questions
-        if len(st.session_state.chat_history) == 0:
-            st.subheader("💡 Suggested Questions")
-            st.caption("Click any question below to get started:")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("📊 What are the main trends in the data?", use_container_width=True, key="q1"):
-                    st.session_state.pending_question = "What are the main trends in the data?"
-                    st.rerun()
-                if st.button("📈 Show me summary statistics", use_container_width=True, key="q2"):
-                    st.session_state.pending_question = "Show me summary statistics"
-                    st.rerun()
-            
-            with col2:
-                if st.button("🔍 What insights can you find?", use_container_width=True, key="q3"):
-                    st.session_state.pending_question = "What insights can you find in this data?"
-                    st.rerun()
-                if st.button("❓ What columns have missing data?", use_container_width=True, key="q4"):
-                    st.session_state.pending_question = "What columns have missing data?"
-                    st.rerun()
-            
-            st.divider()
-        
-        # Chat input
-        query = st.chat_input("Ask a question about your data...")
-        
-        if query:
-            with st.chat_message("user"):
-                st.write(query)
-            
-            with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    answer, error = process_query(query, k_value)
-                    
-                    if answer:
-                        st.write(answer)
-                        st.session_state.chat_history.append({
-                            'question': query,
-                            'answer': answer
-                        })
-                    else:
-                        st.error(error)
+        _tab_chat(k_value)
     
-    # Tab 3: Insights - FIXED!
     with tab3:
-        st.header("💡 AI-Generated Business Insights")
-        
-        if st.button("🎯 Generate Insights", use_container_width=True):
-            with st.spinner("Analyzing your data and generating insights..."):
-                try:
-                    response = requests.post(
-                        f"{API_BASE_URL}/insights",
-                        json={"df_summary": st.session_state.data_summary, "k": 6},
-                        timeout=120
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        insights_text = result['insights']
-                        
-                        # Escape dollar signs in insights too
-                        insights_text = insights_text.replace('$', '\\$')
-                        
-                        st.markdown("---")
-                        
-                        # Split by "**Insight" to separate each insight
-                        insight_sections = insights_text.split('**Insight')
-                        
-                        for idx, section in enumerate(insight_sections[1:], 1):
-                            section = '**Insight' + section
-                            section = section.strip()
-                            
-                            # Create expander
-                            with st.expander(f"💡 Insight {idx}", expanded=(idx <= 2)):
-                                # Render as markdown (not HTML) - this fixes the formatting!
-                                st.markdown(section)
-                        
-                        st.markdown("---")
-                        
-                        st.download_button(
-                            label="📥 Download Insights Report",
-                            data=insights_text,
-                            file_name="business_insights.txt",
-                            mime="text/plain",
-                            use_container_width=True
-                        )
-                    else:
-                        st.error(f"Error: {response.text}")
-                except requests.exceptions.Timeout:
-                    st.error("⏱️ Request timed out. Please try again.")
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+        _tab_insights()
     
-    # Tab 4: Visualizations
     with tab4:
-        st.header("📈 Data Visualizations")
-        
-        numeric_cols = [col for col in st.session_state.df.columns 
-                       if pd.api.types.is_numeric_dtype(st.session_state.df[col])]
-        
-        if len(numeric_cols) > 0:
-            st.subheader("📊 Distribution Analysis")
-            selected_col = st.selectbox("Select column", numeric_cols)
-            
-            fig = px.histogram(st.session_state.df, x=selected_col, 
-                             title=f"Distribution of {selected_col}",
-                             marginal="box")
-            st.plotly_chart(fig, use_container_width=True)
-            
-            if len(numeric_cols) > 1:
-                st.subheader("🔥 Correlation Heatmap")
-                corr_matrix = st.session_state.df[numeric_cols].corr()
-                
-                fig = px.imshow(corr_matrix, 
-                              text_auto=True,
-                              title="Correlation Matrix",
-                              color_continuous_scale='RdBu_r')
-                st.plotly_chart(fig, use_container_width=True)
-            
-            date_cols = [col for col in st.session_state.df.columns 
-                        if pd.api.types.is_datetime64_any_dtype(st.session_state.df[col])]
-            
-            if len(date_cols) > 0 and len(numeric_cols) > 0:
-                st.subheader("📅 Time Series Analysis")
-                date_col = st.selectbox("Select date column", date_cols)
-                value_col = st.selectbox("Select value column", numeric_cols)
-                
-                fig = px.line(st.session_state.df, x=date_col, y=value_col,
-                            title=f"{value_col} over time")
-                st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No numeric columns found for visualization.")
+        _tab_visualizations()
 
 # Footer
 st.divider()